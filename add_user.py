@@ -5,4 +5,5 @@ from finance.db_helpers import add_user, list_users
 add_user("alice", "mysecretpassword")
 
 # List all users
-list_users()
+for user in list_users():
+    print(*user)
@@ -1,33 +1,50 @@
 # app.py - Smart Personal Finance Tracker (Firebase, robust queries + index handling)
 import streamlit as st
 import pandas as pd
-import matplotlib.pyplot as plt
+import numpy as np
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+from matplotlib.figure import Figure
+import base64
 import hashlib
+import html
+import hmac
 import os
 from datetime import date, datetime
 from io import BytesIO
+from urllib.parse import quote
 import tempfile
 import re
 import time
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from streamlit.runtime.scriptrunner import add_script_run_ctx, get_script_run_ctx
 
-# Optional PDF generation
+# Optional PDF generation: WeasyPrint (HTML -> PDF) preferred, fpdf2 as fallback
+try:
+    import weasyprint
+    _WEASYPRINT_AVAILABLE = True
+except Exception:
+    weasyprint = None
+    _WEASYPRINT_AVAILABLE = False
 try:
     from fpdf import FPDF
     _FPDF_AVAILABLE = True
 except Exception:
     _FPDF_AVAILABLE = False
+_PDF_AVAILABLE = _WEASYPRINT_AVAILABLE or _FPDF_AVAILABLE
 
 # Firebase admin SDK
 try:
     import firebase_admin
     from firebase_admin import credentials, firestore
     from google.cloud.firestore_v1.base_query import FieldFilter
-    from google.api_core.exceptions import FailedPrecondition, ServiceUnavailable, RetryError
+    from google.api_core.exceptions import AlreadyExists, FailedPrecondition, ServiceUnavailable, RetryError
     _FIREBASE_AVAILABLE = True
 except Exception as e:
     firebase_admin = None
     firestore = None
     FieldFilter = None
+    AlreadyExists = Exception
     FailedPrecondition = Exception
     ServiceUnavailable = Exception
     RetryError = Exception
@@ -55,9 +72,14 @@ def init_firebase():
         firebase_admin.initialize_app(cred)
     return firestore.client()
 
+@st.cache_resource(show_spinner=False)
+def get_db():
+    """Firestore client shared across reruns and sessions so the gRPC channel pool is reused."""
+    return init_firebase()
+
 # Try initializing once; if fails, we'll show a clear error in the UI.
 try:
-    db = init_firebase()
+    db = get_db()
     FIRESTORE_OK = True
 except Exception as e:
     db = None
@@ -68,25 +90,61 @@ except Exception as e:
 def sha256_hash(text: str) -> str:
     return hashlib.sha256(text.encode()).hexdigest()
 
+def hash_password(password: str, salt: bytes) -> str:
+    """Salted scrypt hash (OpenSSL-backed) stored as hex in users/{username}.password."""
+    return hashlib.scrypt(password.encode(), salt=salt, n=2**14, r=8, p=1, dklen=32).hex()
+
+def verify_password(user: dict, password: str) -> bool:
+    stored = user.get("password") or ""
+    salt = user.get("salt")
+    if salt:
+        return hmac.compare_digest(stored, hash_password(password, bytes.fromhex(salt)))
+    # legacy accounts: unsalted sha256
+    return hmac.compare_digest(stored, sha256_hash(password))
+
+def is_valid_doc_id(name: str) -> bool:
+    return bool(name) and "/" not in name and name not in (".", "..")
+
+def category_doc_id(user_id: str, name: str, ctype: str) -> str:
+    """Deterministic category doc id, so a duplicate add fails on create() instead of needing a lookup."""
+    return sha256_hash(f"{user_id}|{name}|{ctype}")[:20]
+
 def doc_to_dict(doc):
     d = doc.to_dict()
     d["_id"] = doc.id
     return d
 
+# Firebase index creation URLs typically contain 'console.firebase.google.com' and 'create_composite='
+_INDEX_URL_RE_1 = re.compile(r"(https?://console\.firebase\.google\.com/[^ ]*create_composite=[^ \n\r]+)")
+# sometimes it's slightly different - fallback search
+_INDEX_URL_RE_2 = re.compile(r"(https?://console\.firebase\.google\.com/[^\s]+/indexes\?[^\s]+)")
+
+_WORD_RE = re.compile(r"\w+")
+
+def keywords_for(text: str) -> list:
+    """Lowercased unique words of a description, stored as `keywords` for array_contains search."""
+    return list({w.lower() for w in _WORD_RE.findall(text or "")})
+
 def extract_index_url_from_error(exc_text: str) -> str:
     """Look for a firebase console URL inside an exception message and return it (if any)."""
-    # Firebase index creation URLs typically contain 'console.firebase.google.com' and 'create_composite='
-    m = re.search(r"(https?://console\.firebase\.google\.com/[^ ]*create_composite=[^ \n\r]+)", exc_text)
-    if m:
-        return m.group(1)
-    # sometimes it's slightly different - fallback search
-    m2 = re.search(r"(https?://console\.firebase\.google\.com/[^\s]+/indexes\?[^\s]+)", exc_text)
-    if m2:
-        return m2.group(1)
-    return ""
-
-def safe_get(query, timeout=30):
-    """Call query.get(timeout=...) with friendly error handling and return docs or None."""
+    m = _INDEX_URL_RE_1.search(exc_text) or _INDEX_URL_RE_2.search(exc_text)
+    return m.group(1) if m else ""
+
+def _safe_stream(query, timeout):
+    try:
+        yield from query.stream(timeout=timeout)
+    except FailedPrecondition as fp:
+        url = extract_index_url_from_error(str(fp))
+        raise FailedPrecondition(f"Index required: {fp}. Create it here: {url}") from fp
+    except ServiceUnavailable as su:
+        raise ServiceUnavailable(f"Service temporarily unavailable: {su}") from su
+
+def safe_get(query, timeout=30, stream=False):
+    """Call query.get(timeout=...) with friendly error handling and return docs or None.
+    With stream=True return a generator over query.stream() (same error handling) instead of a list.
+    """
+    if stream:
+        return _safe_stream(query, timeout)
     try:
         return query.get(timeout=timeout)
     except FailedPrecondition as fp:
@@ -100,10 +158,16 @@ def safe_get(query, timeout=30):
     except Exception as e:
         raise e
 
-def collection_to_df(collection_ref, filters=None, order_by=None, limit=None, timeout=30):
+_TEXT_COLUMNS = ("user_id", "category", "description", "name", "type", "month")
+
+def collection_to_df(collection_ref, filters=None, order_by=None, limit=None, timeout=30, start_after=None, include_id=False, fields=None):
     """
     Build a Firestore query from filters (list of (field, op, value)) using FieldFilter,
     run it with timeout and return a pandas DataFrame.
+    start_after is a doc id to resume after (cursor pagination); when the page is full,
+    df.attrs["next_cursor"] holds the id to pass for the next page.
+    The doc id is only added as an `_id` column when include_id=True.
+    fields limits the returned document fields (Firestore projection) to cut payload size.
     """
     if not FIRESTORE_OK:
         raise RuntimeError("Firestore not initialized")
@@ -112,7 +176,8 @@ def collection_to_df(collection_ref, filters=None, order_by=None, limit=None, ti
         for f in filters:
             # use FieldFilter to avoid positional-arg warnings
             try:
-                ff = FieldFilter(f[0], f[1], f[2])
+                # cached callers pass tuples (hashable); Firestore wants a list for in/array_contains_any
+                ff = FieldFilter(f[0], f[1], list(f[2]) if isinstance(f[2], tuple) else f[2])
                 q = q.where(filter=ff)
             except Exception:
                 # fallback to positional if FieldFilter unavailable
@@ -120,23 +185,114 @@ def collection_to_df(collection_ref, filters=None, order_by=None, limit=None, ti
     if order_by:
         # Firestore requires order_by field to be indexed with filters; calling may raise FailedPrecondition
         q = q.order_by(order_by)
+    if fields:
+        q = q.select(list(fields))
+    if start_after:
+        q = q.start_after(collection_ref.document(start_after).get(timeout=timeout))
     if limit:
         q = q.limit(limit)
-    # execute with safe_get (handles index errors etc)
-    docs = safe_get(q, timeout=timeout)
-    rows = [doc_to_dict(d) for d in docs]
-    if rows:
-        df = pd.DataFrame(rows)
-        # ensure expected columns exist and types
+    # stream with safe_get (handles index errors etc) into per-column lists,
+    # so the full result set is never buffered as a list of snapshots
+    cols = {}
+    n = 0
+    last_id = None
+    for doc in safe_get(q, timeout=timeout, stream=True):
+        d = doc_to_dict(doc) if include_id else doc.to_dict()
+        for k, v in d.items():
+            col = cols.get(k)
+            if col is None:
+                col = cols[k] = [None] * n
+            col.append(v)
+        n += 1
+        for col in cols.values():
+            if len(col) < n:
+                col.append(None)
+        last_id = doc.id
+    if n:
+        df = pd.DataFrame(cols)
+        df.attrs["next_cursor"] = last_id if limit and n == limit else None
+        # ensure expected columns exist and types; Arrow-backed dtypes give vectorized string/sort kernels
         if "amount" in df.columns:
-            df["amount"] = pd.to_numeric(df["amount"], errors="coerce").fillna(0.0)
+            df["amount"] = pd.to_numeric(df["amount"], errors="coerce").fillna(0.0).astype("float64[pyarrow]")
         if "date" in df.columns:
-            # keep as string for simplicity; parse where needed
-            df["date"] = df["date"].astype(str)
+            # parse once to datetime64 (vectorized masks/sorts); the original string is kept for exports
+            df["date_raw"] = df["date"].astype(str).astype("string[pyarrow]")
+            df["date"] = pd.to_datetime(df["date_raw"], format="%Y-%m-%d", errors="coerce")
+        for c in _TEXT_COLUMNS:
+            if c in df.columns:
+                df[c] = df[c].astype("string[pyarrow]")
         return df
     else:
         return pd.DataFrame()
 
+_INTERNAL_COLUMNS = ("keywords", "user_id", "created_at")
+
+def export_view(df):
+    """Table/CSV view: the stored YYYY-MM-DD date string instead of the parsed one, without internal fields."""
+    if "date_raw" in df.columns:
+        df = df.assign(date=df["date_raw"]).drop(columns="date_raw")
+    return df.drop(columns=[c for c in _INTERNAL_COLUMNS if c in df.columns])
+
+# ---------- Read cache ----------
+@st.cache_resource(show_spinner=False)
+def _cache_versions():
+    """Per-user cache versions, shared by every session like st.cache_data itself, so they only ever go up
+    (a logout or a second session for the same user cannot fall back to entries cached before a write).
+    """
+    return {}, threading.Lock()
+
+def _cache_ver(user_id: str) -> int:
+    return _cache_versions()[0].get(user_id, 0)
+
+def invalidate_user_cache(user_id: str):
+    """Bump the per-user cache version so the next read skips stale cached queries."""
+    versions, lock = _cache_versions()
+    with lock:
+        versions[user_id] = versions.get(user_id, 0) + 1
+
+@st.cache_data(ttl=60, show_spinner=False)
+def _cached_query(col_name, filters, order_by, limit, timeout, start_after, include_id, fields, cache_ver):
+    """Memoized collection_to_df keyed by the query shape. cache_ver only takes part in the key."""
+    return collection_to_df(db.collection(col_name), filters=list(filters), order_by=order_by, limit=limit,
+                            timeout=timeout, start_after=start_after, include_id=include_id, fields=fields)
+
+def cached_query(user_id: str, col_name: str, filters, order_by=None, limit=None, timeout=30, start_after=None, include_id=False, fields=None):
+    """Run a user-scoped query through the rerun cache (filters must contain hashable values)."""
+    return _cached_query(col_name, tuple(filters), order_by, limit, timeout, start_after, include_id,
+                         tuple(fields) if fields else None, _cache_ver(user_id))
+
+# ---------- Parallel reads ----------
+@st.cache_resource(show_spinner=False)
+def _read_pool():
+    """One thread pool per process; firestore clients are thread-safe."""
+    return ThreadPoolExecutor(max_workers=8, thread_name_prefix="firestore-read")
+
+def run_parallel(queries: dict) -> dict:
+    """Run independent read callables concurrently and return {name: result}.
+    Wall-clock becomes the slowest query instead of the sum of all of them.
+    """
+    ctx = get_script_run_ctx()
+
+    def _call(fn):
+        # let st.error / st.session_state / st.cache_data work inside the worker
+        add_script_run_ctx(threading.current_thread(), ctx)
+        return fn()
+
+    futures = {name: _read_pool().submit(_call, fn) for name, fn in queries.items()}
+    return {name: fut.result() for name, fut in futures.items()}
+
+# ---------- Aggregation helpers ----------
+def category_totals(df) -> pd.Series:
+    """Sum of amount per category, largest first."""
+    if len(df) < 200:
+        # pandas overhead is negligible for small frames
+        return df.groupby("category")["amount"].sum().sort_values(ascending=False)
+    codes, uniques = pd.factorize(df["category"].to_numpy())
+    keep = codes >= 0  # missing categories are dropped, as groupby does
+    totals = np.bincount(codes[keep], weights=df["amount"].to_numpy(dtype=float)[keep], minlength=len(uniques))
+    order = np.argsort(-totals, kind="stable")
+    return pd.Series(totals[order], index=uniques[order])
+
 # ---------- Firestore-backed CRUD ----------
 def ensure_firestore_ready_ui():
     if not FIRESTORE_OK:
@@ -147,29 +303,29 @@ def ensure_firestore_ready_ui():
 # Users
 def create_user(username: str, password: str):
     ensure_firestore_ready_ui()
-    users_ref = db.collection("users")
+    if not is_valid_doc_id(username):
+        return False, "Username cannot contain '/' or be '.' / '..'"
     try:
-        # check existence
-        docs = safe_get(users_ref.where(filter=FieldFilter("username", "==", username)).limit(1))
-        if docs and len(list(docs)) > 0:
-            return False, "Username already exists"
-        hashed = sha256_hash(password)
-        new_user = users_ref.add({"username": username, "password": hashed, "created_at": firestore.SERVER_TIMESTAMP})
-        # get created id (second element)
-        user_id = new_user[1].id if isinstance(new_user, tuple) else new_user.id
-        # create default categories using batch
+        # users/{username}: the create() in the batch fails if the username is taken,
+        # so no read is needed before the write (legacy auto-id users are moved here by migrate_firestore.py)
+        user_ref = db.collection("users").document(username)
+        user_id = user_ref.id
+        salt = os.urandom(16)
+        batch = db.batch()
+        batch.create(user_ref, {"username": username, "password": hash_password(password, salt), "salt": salt.hex(),
+                                "created_at": firestore.SERVER_TIMESTAMP})
+        # create default categories in the same batch
         defaults_exp = ["Food", "Transport", "Shopping", "Bills", "Entertainment", "Other"]
         defaults_inc = ["Salary", "Interest", "Gift", "Other"]
-        batch = db.batch()
         cat_ref = db.collection("categories")
         for c in defaults_exp:
-            d = cat_ref.document()
-            batch.set(d, {"user_id": user_id, "name": c, "type": "expense"})
+            batch.set(cat_ref.document(category_doc_id(user_id, c, "expense")), {"user_id": user_id, "name": c, "type": "expense"})
         for c in defaults_inc:
-            d = cat_ref.document()
-            batch.set(d, {"user_id": user_id, "name": c, "type": "income"})
+            batch.set(cat_ref.document(category_doc_id(user_id, c, "income")), {"user_id": user_id, "name": c, "type": "income"})
         batch.commit()
         return True, "Created"
+    except AlreadyExists:
+        return False, "Username already exists"
     except FailedPrecondition as fp:
         url = extract_index_url_from_error(str(fp))
         return False, f"Firestore index required: create it here: {url}" 
@@ -179,15 +335,24 @@ def create_user(username: str, password: str):
 def authenticate(username: str, password: str):
     ensure_firestore_ready_ui()
     users_ref = db.collection("users")
-    hashed = sha256_hash(password)
     try:
-        # use FieldFilter to avoid positional-arg warnings
-        q = users_ref.where(filter=FieldFilter("username", "==", username)).where(filter=FieldFilter("password", "==", hashed)).limit(1)
-        docs = safe_get(q, timeout=20)
-        docs_list = list(docs)
-        if docs_list:
-            return docs_list[0].id
-        return None
+        if not is_valid_doc_id(username):
+            return None
+        snap = users_ref.document(username).get(timeout=20)
+        if not snap.exists:
+            return None
+        user = snap.to_dict()
+        if not verify_password(user, password):
+            return None
+        if not user.get("salt"):
+            # upgrade legacy sha256 hash now that we have the plaintext
+            salt = os.urandom(16)
+            try:
+                users_ref.document(snap.id).update({"password": hash_password(password, salt), "salt": salt.hex()})
+            except Exception:
+                pass
+        # migrated legacy accounts keep their old auto-id as the user id their data is stored under
+        return user.get("uid", snap.id)
     except FailedPrecondition as fp:
         url = extract_index_url_from_error(str(fp))
         st.error("Firestore index required for this query. Create it here:\n" + (url or str(fp)))
@@ -202,9 +367,8 @@ def authenticate(username: str, password: str):
 # Categories
 def get_categories(user_id: str, ctype="expense"):
     ensure_firestore_ready_ui()
-    col = db.collection("categories")
     try:
-        df = collection_to_df(col, filters=[("user_id","==",user_id),("type","==",ctype)], order_by="name", timeout=20)
+        df = cached_query(user_id, "categories", [("user_id","==",user_id),("type","==",ctype)], order_by="name", timeout=20)
         return df["name"].tolist() if not df.empty else []
     except FailedPrecondition as fp:
         # index required
@@ -215,29 +379,92 @@ def get_categories(user_id: str, ctype="expense"):
         st.error(f"Could not fetch categories: {e}")
         return []
 
+def get_all_categories(user_id: str) -> dict:
+    """Expense and income categories fetched concurrently, as {"expense": [...], "income": [...]}.
+    Both land in the read cache, so whichever tab renders next gets its list without a round trip.
+    """
+    return run_parallel({t: (lambda t=t: get_categories(user_id, t)) for t in ("expense", "income")})
+
 def add_category(user_id: str, name: str, ctype: str):
     ensure_firestore_ready_ui()
     col = db.collection("categories")
     try:
-        existing = safe_get(col.where(filter=FieldFilter("user_id","==",user_id)).where(filter=FieldFilter("name","==",name)).where(filter=FieldFilter("type","==",ctype)).limit(1), timeout=15)
-        if list(existing):
-            return False
-    except Exception:
-        # ignore index issues - try a last resort
-        pass
-    col.add({"user_id": user_id, "name": name, "type": ctype})
+        # legacy auto-id categories are moved to these ids by migrate_firestore.py
+        col.document(category_doc_id(user_id, name, ctype)).create({"user_id": user_id, "name": name, "type": ctype})
+    except AlreadyExists:
+        return False
+    except ServiceUnavailable:
+        st.error("Firestore temporarily unavailable. Try again later.")
+        return False
+    except Exception as e:
+        st.error(f"Could not add category: {e}")
+        return False
+    invalidate_user_cache(user_id)
     return True
 
+# Monthly rollups: one doc per (user, YYYY-MM) kept in step with every expense/income write
+def _rollup_ref(user_id: str, month: str):
+    return db.collection("monthly_rollups").document(f"{user_id}_{month}")
+
+def _increment_rollup(batch, user_id: str, month: str, kind: str, amount: float, count: int = 1):
+    batch.set(_rollup_ref(user_id, month), {
+        "user_id": user_id,
+        "month": month,
+        f"{kind}_total": firestore.Increment(amount),
+        f"{kind}_count": firestore.Increment(count),
+    }, merge=True)
+
+def _write_entry(kind: str, data: dict):
+    """Write one expense/income doc and its rollup increment in a single atomic batch (one commit RPC)."""
+    batch = db.batch()
+    batch.set(db.collection(f"{kind}s").document(), data)
+    _increment_rollup(batch, data["user_id"], data["date"][:7], kind, data["amount"])
+    batch.commit()
+    invalidate_user_cache(data["user_id"])
+
+@st.cache_data(ttl=60, show_spinner=False)
+def _cached_rollup(user_id, month, cache_ver):
+    snap = _rollup_ref(user_id, month).get(timeout=15)
+    return snap.to_dict() if snap.exists else None
+
+def get_month_rollup(user_id: str, month: str):
+    """Return the monthly_rollups doc for this month, or None if it was never written."""
+    ensure_firestore_ready_ui()
+    try:
+        return _cached_rollup(user_id, month, _cache_ver(user_id))
+    except Exception as e:
+        st.error(f"Could not fetch monthly totals: {e}")
+        return None
+
 # Expenses & incomes
+def _push_down_text_filter(qtext: str, filters: list):
+    """Turn a description search into an indexed `keywords` filter.
+    One word: exact keyword match, no local pass needed (returns qtext=None).
+    Several words: filter on the longest (likely rarest) word, keep the local substring pass.
+    """
+    words = keywords_for(qtext)
+    if not words:
+        return qtext, filters
+    filters = filters + [("keywords", "array_contains", max(words, key=len))]
+    return (None if len(words) == 1 else qtext), filters
+
+def _with_filter_fields(fields, qtext):
+    """Projection for get_expenses/get_incomes: the local filters still need amount and description."""
+    if not fields:
+        return None
+    needed = {"amount"} | ({"description"} if qtext else set())
+    return tuple(fields) + tuple(sorted(needed - set(fields)))
+
 def add_expense(user_id: str, date_s: str, category: str, amount: float, description: str = ""):
     ensure_firestore_ready_ui()
     try:
-        db.collection("expenses").add({
+        _write_entry("expense", {
             "user_id": user_id,
             "date": date_s,
             "category": category,
             "amount": float(amount),
             "description": description,
+            "keywords": keywords_for(description),
             "created_at": firestore.SERVER_TIMESTAMP
         })
         return True
@@ -245,9 +472,8 @@ def add_expense(user_id: str, date_s: str, category: str, amount: float, descrip
         st.error(f"Could not add expense: {e}")
         return False
 
-def get_expenses(user_id: str, start_date=None, end_date=None, category=None, qtext=None, min_amt=None, max_amt=None, limit=1000):
+def get_expenses(user_id: str, start_date=None, end_date=None, category=None, qtext=None, min_amt=None, max_amt=None, limit=1000, start_after=None, fields=None):
     ensure_firestore_ready_ui()
-    col = db.collection("expenses")
     filters = [("user_id","==",user_id)]
     if start_date:
         filters.append(("date", ">=", start_date))
@@ -255,8 +481,11 @@ def get_expenses(user_id: str, start_date=None, end_date=None, category=None, qt
         filters.append(("date", "<=", end_date))
     if category:
         filters.append(("category", "==", category))
+    if qtext:
+        qtext, filters = _push_down_text_filter(qtext, filters)
     try:
-        df = collection_to_df(col, filters=filters, order_by="date", limit=limit, timeout=30)
+        df = cached_query(user_id, "expenses", filters, order_by="date", limit=limit, timeout=30, start_after=start_after,
+                          fields=_with_filter_fields(fields, qtext))
     except FailedPrecondition as fp:
         url = extract_index_url_from_error(str(fp))
         st.error("Firestore index required for expenses query. Create it here:\n" + (url or str(fp)))
@@ -271,24 +500,26 @@ def get_expenses(user_id: str, start_date=None, end_date=None, category=None, qt
     if df.empty:
         return df
     if qtext:
-        df = df[df["description"].str.lower().str.contains(qtext.lower(), na=False)]
+        df = df[df["description"].str.contains(qtext, case=False, regex=False, na=False)]
     if min_amt is not None:
         df = df[df["amount"] >= float(min_amt)]
     if max_amt is not None:
         df = df[df["amount"] <= float(max_amt)]
-    # sort descending by date (string compare works for YYYY-MM-DD)
-    df = df.sort_values("date", ascending=False)
+    # sort descending by date (datetime64, so an int64 sort)
+    if "date" in df.columns:
+        df = df.sort_values("date", ascending=False, kind="stable")
     return df
 
 def add_income(user_id: str, date_s: str, category: str, amount: float, description: str = ""):
     ensure_firestore_ready_ui()
     try:
-        db.collection("incomes").add({
+        _write_entry("income", {
             "user_id": user_id,
             "date": date_s,
             "category": category,
             "amount": float(amount),
             "description": description,
+            "keywords": keywords_for(description),
             "created_at": firestore.SERVER_TIMESTAMP
         })
         return True
@@ -296,9 +527,8 @@ def add_income(user_id: str, date_s: str, category: str, amount: float, descript
         st.error(f"Could not add income: {e}")
         return False
 
-def get_incomes(user_id: str, start_date=None, end_date=None, category=None, qtext=None, min_amt=None, max_amt=None, limit=1000):
+def get_incomes(user_id: str, start_date=None, end_date=None, category=None, qtext=None, min_amt=None, max_amt=None, limit=1000, fields=None):
     ensure_firestore_ready_ui()
-    col = db.collection("incomes")
     filters = [("user_id","==",user_id)]
     if start_date:
         filters.append(("date", ">=", start_date))
@@ -306,8 +536,11 @@ def get_incomes(user_id: str, start_date=None, end_date=None, category=None, qte
         filters.append(("date", "<=", end_date))
     if category:
         filters.append(("category", "==", category))
+    if qtext:
+        qtext, filters = _push_down_text_filter(qtext, filters)
     try:
-        df = collection_to_df(col, filters=filters, order_by="date", limit=limit, timeout=30)
+        df = cached_query(user_id, "incomes", filters, order_by="date", limit=limit, timeout=30,
+                          fields=_with_filter_fields(fields, qtext))
     except FailedPrecondition as fp:
         url = extract_index_url_from_error(str(fp))
         st.error("Firestore index required for incomes query. Create it here:\n" + (url or str(fp)))
@@ -321,97 +554,169 @@ def get_incomes(user_id: str, start_date=None, end_date=None, category=None, qte
     if df.empty:
         return df
     if qtext:
-        df = df[df["description"].str.lower().str.contains(qtext.lower(), na=False)]
+        df = df[df["description"].str.contains(qtext, case=False, regex=False, na=False)]
     if min_amt is not None:
         df = df[df["amount"] >= float(min_amt)]
     if max_amt is not None:
         df = df[df["amount"] <= float(max_amt)]
-    df = df.sort_values("date", ascending=False)
+    if "date" in df.columns:
+        df = df.sort_values("date", ascending=False, kind="stable")
     return df
 
+# Month totals
+@st.cache_data(ttl=60, show_spinner=False)
+def _cached_month_total(user_id, col_name, month, cache_ver):
+    q = db.collection(col_name).where(filter=FieldFilter("user_id","==",user_id)) \
+        .where(filter=FieldFilter("date",">=",month + "-01")) \
+        .where(filter=FieldFilter("date","<=",month + "-31"))
+    result = safe_get(q.sum("amount"), timeout=20)
+    value = result[0][0].value if result and result[0] else 0.0
+    return float(value or 0.0)
+
+def month_total(user_id: str, col_name: str, month: str) -> float:
+    """Sum `amount` for one month server-side (Firestore sum() aggregation) instead of fetching every doc."""
+    ensure_firestore_ready_ui()
+    try:
+        return _cached_month_total(user_id, col_name, month, _cache_ver(user_id))
+    except FailedPrecondition as fp:
+        url = extract_index_url_from_error(str(fp))
+        st.error(f"Firestore index required for {col_name} totals. Create it here:\n" + (url or str(fp)))
+        return 0.0
+    except ServiceUnavailable:
+        st.error("Firestore temporarily unavailable. Try again later.")
+        return 0.0
+    except Exception as e:
+        st.error(f"Could not total {col_name}: {e}")
+        return 0.0
+
 # Budgets
+def monthly_budget_doc_id(user_id: str, month: str) -> str:
+    return f"{user_id}_{month}"
+
 def set_monthly_budget(user_id: str, month: str, budget: float):
     ensure_firestore_ready_ui()
     col = db.collection("budgets")
     try:
-        docs = safe_get(col.where(filter=FieldFilter("user_id","==",user_id)).where(filter=FieldFilter("month","==",month)).limit(1), timeout=15)
-        docs_list = list(docs)
-        if docs_list:
-            col.document(docs_list[0].id).update({"budget": float(budget)})
-        else:
-            col.add({"user_id": user_id, "month": month, "budget": float(budget)})
+        # deterministic id: one idempotent write, no lookup first
+        col.document(monthly_budget_doc_id(user_id, month)).set(
+            {"user_id": user_id, "month": month, "budget": float(budget)}, merge=True)
+        invalidate_user_cache(user_id)
+        return True
     except Exception as e:
         st.error(f"Could not set budget: {e}")
+        return False
 
-def get_monthly_budget(user_id: str, month: str):
+def get_budgets_for_months(user_id: str, months) -> dict:
+    """Monthly budgets for up to 30 months in one `in` query, as {month: budget}.
+    The deterministic-id doc wins over a legacy auto-id doc for the same month.
+    """
     ensure_firestore_ready_ui()
-    col = db.collection("budgets")
     try:
-        docs = safe_get(col.where(filter=FieldFilter("user_id","==",user_id)).where(filter=FieldFilter("month","==",month)).limit(1), timeout=15)
-        docs_list = list(docs)
-        if docs_list:
-            return docs_list[0].to_dict().get("budget")
-        return None
+        df = cached_query(user_id, "budgets", [("user_id","==",user_id),("month","in",tuple(months[:30]))],
+                          timeout=15, include_id=True)
+        if df.empty or "budget" not in df.columns:
+            return {}
+        out = {}
+        for doc_id, m, b in zip(df["_id"].to_numpy(), df["month"].to_numpy(), df["budget"].to_numpy()):
+            if doc_id == monthly_budget_doc_id(user_id, m) or m not in out:
+                out[m] = b
+        return out
     except Exception as e:
-        st.error(f"Could not fetch budget: {e}")
-        return None
+        st.error(f"Could not fetch budgets: {e}")
+        return {}
+
+def recent_months(n: int = 12) -> list:
+    """The current month and the n-1 before it, as YYYY-MM strings (newest first)."""
+    today = date.today()
+    y, m = today.year, today.month
+    out = []
+    for _ in range(n):
+        out.append(f"{y:04d}-{m:02d}")
+        y, m = (y, m - 1) if m > 1 else (y - 1, 12)
+    return out
+
+def category_budget_doc_id(user_id: str, month: str, category: str) -> str:
+    return f"{user_id}_{month}_{quote(category, safe='')}"
 
 def set_category_budget(user_id: str, month: str, category: str, budget: float):
     ensure_firestore_ready_ui()
     col = db.collection("category_budgets")
     try:
-        docs = safe_get(col.where(filter=FieldFilter("user_id","==",user_id)).where(filter=FieldFilter("month","==",month)).where(filter=FieldFilter("category","==",category)).limit(1), timeout=15)
-        dl = list(docs)
-        if dl:
-            col.document(dl[0].id).update({"budget": float(budget)})
-        else:
-            col.add({"user_id": user_id, "month": month, "category": category, "budget": float(budget)})
+        col.document(category_budget_doc_id(user_id, month, category)).set(
+            {"user_id": user_id, "month": month, "category": category, "budget": float(budget)}, merge=True)
+        invalidate_user_cache(user_id)
+        return True
     except Exception as e:
         st.error(f"Could not set category budget: {e}")
+        return False
 
-def get_category_budget(user_id: str, month: str, category: str):
-    ensure_firestore_ready_ui()
-    col = db.collection("category_budgets")
-    try:
-        docs = safe_get(col.where(filter=FieldFilter("user_id","==",user_id)).where(filter=FieldFilter("month","==",month)).where(filter=FieldFilter("category","==",category)).limit(1), timeout=15)
-        dl = list(docs)
-        if dl:
-            return dl[0].to_dict().get("budget")
-        return None
-    except Exception as e:
-        st.error(f"Could not fetch category budget: {e}")
-        return None
+def latest_category_budgets(user_id: str, df):
+    """One row per (month, category) from a category_budgets query made with include_id=True.
+    A legacy auto-id doc is only used when no deterministic-id doc exists for the pair, since
+    set_category_budget writes (and updates) only the deterministic one.
+    """
+    if df.empty:
+        return df
+    current = np.array([i == category_budget_doc_id(user_id, m, c)
+                        for i, m, c in zip(df["_id"], df["month"], df["category"])])
+    return df.assign(_current=current).sort_values("_current", ascending=False, kind="stable") \
+        .drop_duplicates(["month", "category"]).drop(columns="_current")
 
 # ---------- PDF generation ----------
-def generate_pdf(user_id: str, month: str):
-    if not _FPDF_AVAILABLE:
-        raise RuntimeError("Install fpdf2: pip install fpdf2")
-    start = month + "-01"; end = month + "-31"
-    exp_df = get_expenses(user_id, start_date=start, end_date=end)
-    inc_df = get_incomes(user_id, start_date=start, end_date=end)
-    tot_exp = exp_df["amount"].sum() if not exp_df.empty else 0.0
-    tot_inc = inc_df["amount"].sum() if not inc_df.empty else 0.0
-    net = tot_inc - tot_exp
-    budget = get_monthly_budget(user_id, month)
-    imgs = []
+def _render_bar_chart(s, fig, ax, fmt="jpg") -> BytesIO:
+    """Draw a category -> amount Series as bars onto a reused figure and return the encoded image."""
+    ax.clear()
+    ax.bar(range(len(s)), s.to_numpy(dtype=float))
+    ax.set_ylabel("Amount")
+    ax.set_xticks(range(len(s.index)))
+    ax.set_xticklabels(s.index, rotation=30, ha="right")
+    buf = BytesIO()
+    if fmt == "jpg":
+        fig.savefig(buf, format="jpg", dpi=100, pil_kwargs={"quality": 85})
+    else:
+        fig.savefig(buf, format=fmt)
+    buf.seek(0)
+    return buf
+
+@st.cache_data(ttl=120, show_spinner=False)
+def _render_cat_chart(pairs: tuple) -> bytes:
+    """PNG of the Dashboard category chart, cached on the (category, amount) pairs it shows."""
+    fig = Figure()
+    FigureCanvasAgg(fig)
+    ax = fig.add_subplot()
+    fig.subplots_adjust(bottom=0.25)
+    s = pd.Series([v for _, v in pairs], index=[c for c, _ in pairs], dtype=float)
+    return _render_bar_chart(s, fig, ax, fmt="png").getvalue()
+
+_REPORT_CSS = """
+body { font-family: Arial, sans-serif; font-size: 11pt; }
+h1 { text-align: center; font-size: 16pt; }
+img { width: 180mm; margin: 4mm 0; }
+table { border-collapse: collapse; }
+th { background: #e6e6e6; }
+th, td { border: 1px solid #000; padding: 2px 6px; }
+"""
+
+def _write_pdf_html(out, month, tot_inc, tot_exp, net, budget, imgs, exp_df):
+    """Render the report as HTML (table via DataFrame.to_html) and convert it with WeasyPrint."""
+    parts = [f"<h1>Finance Report - {html.escape(month)}</h1>",
+             f"<p>Total Income: {tot_inc:.2f}<br>Total Expenses: {tot_exp:.2f}<br>Net Savings: {net:.2f}"]
+    if budget is not None:
+        parts.append(f"<br>Budget: {budget:.2f}")
+    parts.append("</p>")
+    for imgbuf in imgs:
+        parts.append(f"<img src='data:image/jpeg;base64,{base64.b64encode(imgbuf.getvalue()).decode()}'>")
+    parts.append("<h3>Top expenses (sample)</h3>")
     if not exp_df.empty:
-        fig, ax = plt.subplots(figsize=(6,3))
-        s = exp_df.groupby("category")["amount"].sum().sort_values(ascending=False)
-        s.plot(kind="bar", ax=ax)
-        ax.set_ylabel("Amount")
-        ax.set_xticks(range(len(s.index)))
-        ax.set_xticklabels(s.index, rotation=30, ha="right")
-        plt.tight_layout()
-        buf = BytesIO(); fig.savefig(buf, format="png"); buf.seek(0); imgs.append(buf); plt.close(fig)
-    if not inc_df.empty:
-        fig, ax = plt.subplots(figsize=(6,3))
-        s = inc_df.groupby("category")["amount"].sum().sort_values(ascending=False)
-        s.plot(kind="bar", ax=ax)
-        ax.set_ylabel("Amount")
-        ax.set_xticks(range(len(s.index)))
-        ax.set_xticklabels(s.index, rotation=30, ha="right")
-        plt.tight_layout()
-        buf = BytesIO(); fig.savefig(buf, format="png"); buf.seek(0); imgs.append(buf); plt.close(fig)
+        sample = exp_df.head(20)[["date_raw", "category", "amount"]]
+        sample = sample.assign(amount=sample["amount"].map("{:.2f}".format))
+        parts.append(sample.rename(columns={"date_raw": "Date", "category": "Category", "amount": "Amount"}).to_html(index=False))
+    else:
+        parts.append("<p>No expenses in this month.</p>")
+    doc = f"<html><head><style>{_REPORT_CSS}</style></head><body>{''.join(parts)}</body></html>"
+    weasyprint.HTML(string=doc).write_pdf(out)
+
+def _write_pdf_fpdf(out, month, tot_inc, tot_exp, net, budget, imgs, exp_df):
     pdf = FPDF()
     pdf.set_auto_page_break(auto=True, margin=15)
     pdf.add_page()
@@ -426,7 +731,7 @@ def generate_pdf(user_id: str, month: str):
         pdf.cell(0, 8, f"Budget: {budget:.2f}", ln=True)
     pdf.ln(6)
     for imgbuf in imgs:
-        tmp = tempfile.NamedTemporaryFile(delete=False, suffix=".png")
+        tmp = tempfile.NamedTemporaryFile(delete=False, suffix=".jpg")
         tmp.write(imgbuf.getbuffer()); tmp.flush(); tmp.close()
         pdf.image(tmp.name, w=180)
         os.unlink(tmp.name)
@@ -440,14 +745,40 @@ def generate_pdf(user_id: str, month: str):
         pdf.cell(40,7,"Date",1,0,'C',fill=True)
         pdf.cell(70,7,"Category",1,0,'C',fill=True)
         pdf.cell(40,7,"Amount",1,1,'C',fill=True)
-        for _, r in sample.iterrows():
-            pdf.cell(40,7,str(r['date']),1,0)
-            pdf.cell(70,7,str(r['category'])[:30],1,0)
-            pdf.cell(40,7,f"{r['amount']:.2f}",1,1)
+        for date_s, cat_s, amt in zip(sample["date_raw"].to_numpy(), sample["category"].to_numpy(), sample["amount"].to_numpy()):
+            pdf.cell(40,7,str(date_s),1,0)
+            pdf.cell(70,7,str(cat_s)[:30],1,0)
+            pdf.cell(40,7,f"{amt:.2f}",1,1)
     else:
         pdf.cell(0,8,"No expenses in this month.", ln=True)
-    out = os.path.join(REPORTS_DIR, f"report_user_{user_id}_{month}.pdf")
     pdf.output(out)
+
+def generate_pdf(user_id: str, month: str):
+    if not _PDF_AVAILABLE:
+        raise RuntimeError("Install weasyprint or fpdf2: pip install weasyprint")
+    start = month + "-01"; end = month + "-31"
+    res = run_parallel({
+        "exp_df": lambda: get_expenses(user_id, start_date=start, end_date=end, fields=("date","category","amount")),
+        "inc_df": lambda: get_incomes(user_id, start_date=start, end_date=end, fields=("category","amount")),
+        "tot_exp": lambda: month_total(user_id, "expenses", month),
+        "tot_inc": lambda: month_total(user_id, "incomes", month),
+        "budgets": lambda: get_budgets_for_months(user_id, [month]),
+    })
+    exp_df, inc_df = res["exp_df"], res["inc_df"]
+    tot_exp, tot_inc, budget = res["tot_exp"], res["tot_inc"], res["budgets"].get(month)
+    net = tot_inc - tot_exp
+    imgs = []
+    if not exp_df.empty or not inc_df.empty:
+        fig = Figure(figsize=(6,3))
+        FigureCanvasAgg(fig)
+        ax = fig.add_subplot()
+        fig.subplots_adjust(left=0.12, right=0.97, top=0.95, bottom=0.3)
+        for df in (exp_df, inc_df):
+            if not df.empty:
+                imgs.append(_render_bar_chart(category_totals(df), fig, ax))
+    out = os.path.join(REPORTS_DIR, f"report_user_{user_id}_{month}.pdf")
+    write = _write_pdf_html if _WEASYPRINT_AVAILABLE else _write_pdf_fpdf
+    write(out, month, tot_inc, tot_exp, net, budget, imgs, exp_df)
     return out
 
 # ---------- UI ----------
@@ -510,18 +841,41 @@ st.sidebar.write(f"Signed in as **{st.session_state.username}**")
 if st.sidebar.button("Logout"):
     st.session_state.clear(); st.experimental_rerun() if hasattr(st, "experimental_rerun") else st.rerun()
 
+def _saved(msg: str):
+    """After a successful write, rerun the whole app so every tab shows it; msg is shown after the rerun."""
+    st.session_state["flash"] = msg
+    st.rerun()
+
+flash = st.session_state.pop("flash", None)
+if flash:
+    st.success(flash)
+
 tabs = st.tabs(["Dashboard","Expenses","Income","Categories","Budgets","Reports","Settings"])
+# Each tab body is a fragment: interacting with a widget reruns only that tab, not every tab's queries.
+# Writes go through _saved(), which reruns the full app so the other tabs do not show stale data.
 
 # ---------- Dashboard ----------
-with tabs[0]:
+@st.fragment
+def _dashboard_tab(uid):
     st.subheader("Overview")
     today = date.today()
     current_month = today.strftime("%Y-%m")
-    exp_df = get_expenses(uid)
-    inc_df = get_incomes(uid)
-    month_exp = exp_df[exp_df['date'].str.startswith(current_month)]['amount'].sum() if not exp_df.empty else 0.0
-    month_inc = inc_df[inc_df['date'].str.startswith(current_month)]['amount'].sum() if not inc_df.empty else 0.0
-    budget = get_monthly_budget(uid, current_month)
+    res = run_parallel({
+        "rollup": lambda: get_month_rollup(uid, current_month),
+        "budgets": lambda: get_budgets_for_months(uid, recent_months()),
+        "exp_df": lambda: get_expenses(uid, fields=("category","amount")),
+    })
+    rollup, budget = res["rollup"], res["budgets"].get(current_month)
+    if rollup is not None:
+        month_exp = float(rollup.get("expense_total", 0.0))
+        month_inc = float(rollup.get("income_total", 0.0))
+    else:
+        # no rollup yet (e.g. data written before migrate_firestore.py was run)
+        totals = run_parallel({
+            "exp": lambda: month_total(uid, "expenses", current_month),
+            "inc": lambda: month_total(uid, "incomes", current_month),
+        })
+        month_exp, month_inc = totals["exp"], totals["inc"]
     col1, col2, col3 = st.columns(3)
     col1.metric("Income (this month)", f"{month_inc:.2f}")
     col2.metric("Expense (this month)", f"{month_exp:.2f}")
@@ -532,23 +886,24 @@ with tabs[0]:
             st.error("⚠ You exceeded your monthly budget!")
         elif month_exp > 0.8 * budget:
             st.warning("⚠ You're nearing the budget")
+    exp_df = res["exp_df"]
     if not exp_df.empty:
         st.markdown("### Expenses By Category (all time)")
-        cat_sum = exp_df.groupby("category")["amount"].sum().sort_values(ascending=False)
-        fig, ax = plt.subplots()
-        ax.bar(cat_sum.index, cat_sum.values)
-        ax.set_xticks(range(len(cat_sum.index)))
-        ax.set_xticklabels(cat_sum.index, rotation=30, ha='right')
-        ax.set_ylabel("Amount")
-        plt.tight_layout()
-        st.pyplot(fig)
+        cat_sum = category_totals(exp_df)
+        png = _render_cat_chart(tuple((str(c), float(v)) for c, v in cat_sum.items()))
+        st.image(png)
+
+with tabs[0]:
+    _dashboard_tab(uid)
 
 # ---------- Expenses tab ----------
-with tabs[1]:
+@st.fragment
+def _expenses_tab(uid):
+    today = date.today()
+    cats = get_all_categories(uid)["expense"]  # used by the form and the filter below
     st.subheader("Add Expense")
     with st.form("frm_add_exp"):
         d = st.date_input("Date", value=date.today())
-        cats = get_categories(uid, "expense")
         cat = st.selectbox("Category", cats if cats else ["Other"])
         newc = st.text_input("Or add new expense category", "")
         amt = st.number_input("Amount", min_value=0.0, format="%.2f")
@@ -558,7 +913,7 @@ with tabs[1]:
                 add_category(uid, newc.strip(), "expense"); cat = newc.strip()
             ok = add_expense(uid, d.strftime("%Y-%m-%d"), cat, float(amt), desc)
             if ok:
-                st.success("Saved.")
+                _saved("Expense saved.")
             else:
                 st.error("Failed to save expense.")
 
@@ -569,26 +924,42 @@ with tabs[1]:
     with colB:
         end = st.date_input("End", value=date.today(), key="exp_end")
     with colC:
-        cat_f = st.selectbox("Category", ["All"] + get_categories(uid, "expense"))
+        cat_f = st.selectbox("Category", ["All"] + cats)
     qtext = st.text_input("Search description (optional)")
     min_amt = st.number_input("Min amount (optional)", value=0.0)
     max_amt = st.number_input("Max amount (optional)", value=0.0)
-    df_exp = get_expenses(uid, start.strftime("%Y-%m-%d"), end.strftime("%Y-%m-%d"), None if cat_f=="All" else cat_f,
-                          qtext if qtext.strip() else None,
-                          min_amt if min_amt>0 else None,
-                          max_amt if max_amt>0 else None)
+    exp_args = (start.strftime("%Y-%m-%d"), end.strftime("%Y-%m-%d"), None if cat_f=="All" else cat_f,
+                qtext if qtext.strip() else None,
+                min_amt if min_amt>0 else None,
+                max_amt if max_amt>0 else None)
+    # "Load more" keeps one cursor per page; earlier pages come from the read cache
+    if st.session_state.get("exp_pages_key") != exp_args:
+        st.session_state.exp_pages_key = exp_args
+        st.session_state.exp_cursors = [None]
+    pages = [get_expenses(uid, *exp_args, start_after=c) for c in st.session_state.exp_cursors]
+    next_cursor = pages[-1].attrs.get("next_cursor")
+    df_exp = pages[0] if len(pages) == 1 else pd.concat(pages).sort_values("date", ascending=False, kind="stable")
     if not df_exp.empty:
+        df_exp = export_view(df_exp)
         st.dataframe(df_exp, use_container_width=True)
         st.download_button("Download expenses CSV", df_exp.to_csv(index=False).encode("utf-8"), "expenses.csv", "text/csv")
     else:
         st.info("No expenses for selected filters.")
+    if next_cursor and st.button("Load more", key="exp_more"):
+        st.session_state.exp_cursors.append(next_cursor)
+        st.rerun(scope="fragment")
+
+with tabs[1]:
+    _expenses_tab(uid)
 
 # ---------- Income tab ----------
-with tabs[2]:
+@st.fragment
+def _income_tab(uid):
+    today = date.today()
+    cats = get_all_categories(uid)["income"]  # used by the form and the filter below
     st.subheader("Add Income")
     with st.form("frm_add_inc"):
         d = st.date_input("Date", value=date.today(), key="inc_date")
-        cats = get_categories(uid, "income")
         cat = st.selectbox("Category", cats if cats else ["Salary"], key="inc_cat")
         newc = st.text_input("Or add new income category", "", key="new_inc_cat")
         amt = st.number_input("Amount", min_value=0.0, format="%.2f", key="inc_amt")
@@ -598,7 +969,7 @@ with tabs[2]:
                 add_category(uid, newc.strip(), "income"); cat = newc.strip()
             ok = add_income(uid, d.strftime("%Y-%m-%d"), cat, float(amt), desc)
             if ok:
-                st.success("Saved.")
+                _saved("Income saved.")
             else:
                 st.error("Failed to save income.")
 
@@ -607,59 +978,76 @@ with tabs[2]:
     with colA: start = st.date_input("Start income", value=date(today.year, today.month, 1), key="inc_start")
     with colB: end = st.date_input("End income", value=date.today(), key="inc_end")
     with colC:
-        cat_f = st.selectbox("Category", ["All"] + get_categories(uid, "income"), key="inc_filter_cat")
+        cat_f = st.selectbox("Category", ["All"] + cats, key="inc_filter_cat")
     df_inc = get_incomes(uid, start.strftime("%Y-%m-%d"), end.strftime("%Y-%m-%d"), None if cat_f=="All" else cat_f)
     if not df_inc.empty:
+        df_inc = export_view(df_inc)
         st.dataframe(df_inc, use_container_width=True)
         st.download_button("Download incomes CSV", df_inc.to_csv(index=False).encode("utf-8"), "incomes.csv", "text/csv")
     else:
         st.info("No incomes for selected filters.")
 
+with tabs[2]:
+    _income_tab(uid)
+
 # ---------- Categories tab ----------
-with tabs[3]:
+@st.fragment
+def _categories_tab(uid):
     st.subheader("Manage Categories")
     col1, col2 = st.columns(2)
     with col1:
         new_e = st.text_input("New expense category")
         if st.button("Add expense category"):
-            if new_e.strip():
-                add_category(uid, new_e.strip(), "expense"); st.success("Added")
-            else: st.warning("Enter name")
+            if not new_e.strip(): st.warning("Enter name")
+            elif add_category(uid, new_e.strip(), "expense"): _saved("Added")
+            else: st.warning("Category already exists")
     with col2:
         new_i = st.text_input("New income category")
         if st.button("Add income category"):
-            if new_i.strip():
-                add_category(uid, new_i.strip(), "income"); st.success("Added")
-            else: st.warning("Enter name")
-    st.write("Expense categories:", get_categories(uid, "expense"))
-    st.write("Income categories:", get_categories(uid, "income"))
+            if not new_i.strip(): st.warning("Enter name")
+            elif add_category(uid, new_i.strip(), "income"): _saved("Added")
+            else: st.warning("Category already exists")
+    res = get_all_categories(uid)
+    st.write("Expense categories:", res["expense"])
+    st.write("Income categories:", res["income"])
+
+with tabs[3]:
+    _categories_tab(uid)
 
 # ---------- Budgets tab ----------
-with tabs[4]:
+@st.fragment
+def _budgets_tab(uid):
     st.subheader("Monthly & Category Budgets")
     mon = st.text_input("Month (YYYY-MM)", value=date.today().strftime("%Y-%m"), key="budget_month")
     total_b = st.number_input("Monthly Budget (total)", min_value=0.0, format="%.2f", key="budget_total")
     if st.button("Save monthly budget"):
-        set_monthly_budget(uid, mon, float(total_b)); st.success("Saved")
+        if set_monthly_budget(uid, mon, float(total_b)): _saved("Monthly budget saved")
     st.subheader("Category Budget")
     cat = st.selectbox("Category", get_categories(uid, "expense"))
     cat_b = st.number_input("Category budget", min_value=0.0, format="%.2f", key="cat_budget")
     if st.button("Save category budget"):
-        set_category_budget(uid, mon, cat, float(cat_b)); st.success("Saved")
+        if set_category_budget(uid, mon, cat, float(cat_b)): _saved("Category budget saved")
     cur_month = date.today().strftime("%Y-%m")
-    mb = get_monthly_budget(uid, cur_month)
+    res = run_parallel({
+        "budgets": lambda: get_budgets_for_months(uid, recent_months()),
+        "cb": lambda: cached_query(uid, "category_budgets", [("user_id","==",uid),("month","==",cur_month)], include_id=True),
+    })
+    mb, cb = res["budgets"].get(cur_month), latest_category_budgets(uid, res["cb"])
     st.write("This month total budget:", mb if mb else "Not set")
-    cb = collection_to_df(db.collection("category_budgets"), filters=[("user_id","==",uid),("month","==",cur_month)])
     if not cb.empty:
         st.write("Category budgets (this month):")
         st.dataframe(cb[["category","budget"]])
 
+with tabs[4]:
+    _budgets_tab(uid)
+
 # ---------- Reports tab ----------
-with tabs[5]:
+@st.fragment
+def _reports_tab(uid):
     st.subheader("PDF / Exports")
     sel_month = st.text_input("Report month (YYYY-MM)", value=date.today().strftime("%Y-%m"))
-    if not _FPDF_AVAILABLE:
-        st.warning("Install fpdf2 for PDF export: pip install fpdf2")
+    if not _PDF_AVAILABLE:
+        st.warning("Install weasyprint (or fpdf2) for PDF export: pip install weasyprint")
     else:
         if st.button("Generate PDF report"):
             try:
@@ -670,12 +1058,18 @@ with tabs[5]:
             except Exception as e:
                 st.error(f"PDF error: {e}")
     st.markdown("---")
-    exp_all = get_expenses(uid)
-    inc_all = get_incomes(uid)
+    res = run_parallel({
+        "exp_all": lambda: get_expenses(uid),
+        "inc_all": lambda: get_incomes(uid),
+    })
+    exp_all, inc_all = res["exp_all"], res["inc_all"]
     if not exp_all.empty:
-        st.download_button("Export all expenses CSV", exp_all.to_csv(index=False).encode("utf-8"), "expenses_all.csv")
+        st.download_button("Export all expenses CSV", export_view(exp_all).to_csv(index=False).encode("utf-8"), "expenses_all.csv")
     if not inc_all.empty:
-        st.download_button("Export all incomes CSV", inc_all.to_csv(index=False).encode("utf-8"), "incomes_all.csv")
+        st.download_button("Export all incomes CSV", export_view(inc_all).to_csv(index=False).encode("utf-8"), "incomes_all.csv")
+
+with tabs[5]:
+    _reports_tab(uid)
 
 # ---------- Settings ----------
 with tabs[6]:
@@ -1,19 +1,11 @@
 # delete_db.py
-import os
-import sqlite3
+from pathlib import Path
 
-db_path = "data/finance.db"
+db_path = Path("data/finance.db")
 
-# Close any lingering connection by opening and closing once
+# A single unlink: no stat beforehand, and no sqlite3.connect (which would create the file if missing)
 try:
-    conn = sqlite3.connect(db_path)
-    conn.close()
-except:
-    pass
-
-# Now delete
-if os.path.exists(db_path):
-    os.remove(db_path)
+    db_path.unlink()
     print("Database deleted.")
-else:
+except FileNotFoundError:
     print("Database not found.")
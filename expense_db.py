@@ -1,64 +1,143 @@
 import firebase_admin
 from firebase_admin import credentials, firestore
+from google.cloud.firestore_v1.base_query import FieldFilter
+import functools
 import os
+import threading
 
-# Path to your Firebase service account key JSON file
-SERVICE_ACCOUNT_KEY = os.path.join(os.getcwd(), "serviceAccountKey.json")
+_init_lock = threading.Lock()
 
-# Initialize Firebase only once
-if not firebase_admin._apps:
-    cred = credentials.Certificate(SERVICE_ACCOUNT_KEY)
-    firebase_admin.initialize_app(cred)
+@functools.lru_cache(maxsize=1)
+def _client():
+    """Return the Firestore client, initializing Firebase on first use rather than at import.
 
-# Firestore client
-db = firestore.client()
+    The key path comes from FIREBASE_KEY (default: serviceAccountKey.json). With
+    FIRESTORE_EMULATOR_HOST set the client talks to the emulator instead.
+    """
+    with _init_lock:
+        if not firebase_admin._apps:
+            firebase_admin.initialize_app(
+                credentials.Certificate(os.environ.get("FIREBASE_KEY", "serviceAccountKey.json")))
+    return firestore.client()
+
+@functools.lru_cache(maxsize=None)
+def _collection(name):
+    """Collection reference, built once and reused by every helper."""
+    return _client().collection(name)
+
+# Query templates: the query shape lives in one place, callers only bind values
+def _user_by_name_query(username):
+    return _collection("users").where(filter=FieldFilter("username", "==", username)).select([]).limit(1)
+
+def _user_login_query(username, password):
+    return _collection("users").where(filter=FieldFilter("username", "==", username)) \
+        .where(filter=FieldFilter("password", "==", password)).select(["uid"]).limit(1)
+
+def _expenses_query(user_id):
+    return _collection("expenses").where(filter=FieldFilter("user_id", "==", user_id))
+
+def _budget_query(user_id, month):
+    return _collection("monthly_budgets").where(filter=FieldFilter("user_id", "==", user_id)) \
+        .where(filter=FieldFilter("month", "==", month)).select(["budget"]).limit(1)
 
 # ===== User Functions =====
-def create_user(username, password):
-    users_ref = db.collection("users")
-    existing_user = users_ref.where("username", "==", username).get()
-    if existing_user:
+@firestore.transactional
+def _create_user_txn(transaction, user_ref, username, password):
+    if user_ref.get(transaction=transaction).exists:
         return False  # Username already exists
-    users_ref.add({"username": username, "password": password})
+    # users created before users/{username} have auto-generated ids
+    if list(_user_by_name_query(username).stream(transaction=transaction)):
+        return False
+    transaction.create(user_ref, {"username": username, "password": password})
     return True
 
+def _is_valid_doc_id(name):
+    return bool(name) and "/" not in name and name not in (".", "..")
+
+def create_user(username, password):
+    if not _is_valid_doc_id(username):
+        return False  # cannot be a document id
+    # users/{username} and the legacy username query are read inside the transaction with the create,
+    # so neither kind of existing user can be duplicated
+    db = _client()
+    return _create_user_txn(db.transaction(), _collection("users").document(username), username, password)
+
 def get_user(username, password):
-    users_ref = db.collection("users")
-    user_query = users_ref.where("username", "==", username).where("password", "==", password).get()
+    user_query = _user_login_query(username, password).get()
     if user_query:
-        return user_query[0].id  # Return user document ID
+        # users moved to users/{username} by migrate_firestore.py keep their old id in `uid`
+        return (user_query[0].to_dict() or {}).get("uid", user_query[0].id)
     return None
 
 # ===== Expense Functions =====
+_BATCH_LIMIT = 500  # Firestore max writes per WriteBatch
+
+def add_expenses(user_id, rows):
+    """Insert many expenses (dicts with date/category/amount/description) in as few round trips as possible.
+
+    Up to 500 rows go in one WriteBatch; larger lists and other iterables stream through a BulkWriter.
+    """
+    db = _client()
+    if isinstance(rows, (list, tuple)) and len(rows) <= _BATCH_LIMIT:
+        batch = db.batch()
+        for r in rows:
+            batch.create(_collection("expenses").document(), {"user_id": user_id, **r})
+        batch.commit()
+        return
+    bw = db.bulk_writer()
+    for r in rows:
+        bw.create(_collection("expenses").document(), {"user_id": user_id, **r})
+    bw.close()  # flushes pending writes and waits for them
+
 def add_expense(user_id, date, category, amount, description):
-    db.collection("expenses").add({
-        "user_id": user_id,
+    add_expenses(user_id, [{
         "date": date,
         "category": category,
         "amount": amount,
         "description": description
-    })
+    }])
+
+def _month_bounds(month):
+    """'YYYY-MM' -> ('YYYY-MM-01', first day of the next month)."""
+    y, m = map(int, month.split("-"))
+    return f"{y:04d}-{m:02d}-01", f"{y + m // 12:04d}-{m % 12 + 1:02d}-01"
+
+def get_expenses(user_id, month=None, page_size=200, cursor=None, fields=None):
+    """Return one page of a user's expenses, newest first, as (rows, last_snapshot).
 
-def get_expenses(user_id):
-    expenses = db.collection("expenses").where("user_id", "==", user_id).stream()
-    return [{"id": e.id, **e.to_dict()} for e in expenses]
+    Pass last_snapshot back as `cursor` to fetch the next page; it is None once there are no more.
+    `month` ('YYYY-MM') filters by date range in Firestore. `fields` (e.g. ("amount", "category", "date"))
+    limits the fields downloaded per document; the id and date are always included.
+    """
+    q = _expenses_query(user_id)
+    if month:
+        start, end = _month_bounds(month)
+        q = q.where(filter=FieldFilter("date", ">=", start)).where(filter=FieldFilter("date", "<", end))
+    if fields:
+        q = q.select(list(dict.fromkeys((*fields, "date"))))  # the cursor needs the order_by field
+    q = q.order_by("date", direction=firestore.Query.DESCENDING).limit(page_size)
+    if cursor is not None:
+        q = q.start_after(cursor)
+    rows, last = [], None
+    for e in q.stream():
+        rows.append({"id": e.id, **e.to_dict()})
+        last = e
+    return rows, (last if len(rows) == page_size else None)
 
 def delete_expense(expense_id):
-    db.collection("expenses").document(expense_id).delete()
+    _collection("expenses").document(expense_id).delete()
 
 # ===== Budget Functions =====
 def set_monthly_budget(user_id, month, budget):
-    budgets_ref = db.collection("monthly_budgets")
-    existing_budget = budgets_ref.where("user_id", "==", user_id).where("month", "==", month).get()
-    if existing_budget:
-        # Update existing budget
-        budgets_ref.document(existing_budget[0].id).update({"budget": budget})
-    else:
-        budgets_ref.add({"user_id": user_id, "month": month, "budget": budget})
+    # deterministic id: one write, no read, and repeating it is harmless
+    _collection("monthly_budgets").document(f"{user_id}_{month}").set({"user_id": user_id, "month": month, "budget": budget}, merge=True)
 
 def get_monthly_budget(user_id, month):
-    budgets_ref = db.collection("monthly_budgets")
-    budget = budgets_ref.where("user_id", "==", user_id).where("month", "==", month).get()
+    doc = _collection("monthly_budgets").document(f"{user_id}_{month}").get()
+    if doc.exists:
+        return doc.to_dict()["budget"]
+    # budgets saved before the deterministic id have auto-generated ids
+    budget = _budget_query(user_id, month).get()
     if budget:
         return budget[0].to_dict()["budget"]
     return None
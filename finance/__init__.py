@@ -1 +1,4 @@
-#__init__.py
\ No newline at end of file
+import logging
+
+# Library modules log at DEBUG on hot paths (login, inserts); keep them quiet unless the app opts in
+logging.getLogger("finance").setLevel(logging.WARNING)
@@ -1,50 +1,112 @@
 # finance/db_helpers.py
 import hashlib
-from finance.db import engine
+import hmac
+import logging
+import threading
+import time
+from argon2 import PasswordHasher
+from argon2.exceptions import InvalidHashError, VerificationError
+from sqlalchemy import bindparam, select
+from sqlalchemy.dialects.sqlite import insert
+from finance.db import SessionLocal
 from finance.models import User
-from sqlalchemy.orm import sessionmaker
 
-Session = sessionmaker(bind=engine)
+log = logging.getLogger(__name__)
+
+# Argon2id at interactive cost (~50 ms per hash)
+_ph = PasswordHasher(time_cost=2, memory_cost=65536, parallelism=1)
+
+# Built once at import; SQLAlchemy caches the compiled form, and only the bound username changes per call
+_USER_BY_NAME = select(User.id, User.password_hash).where(User.username == bindparam("u"))
 
 def hash_password(password: str) -> str:
-    """Hash a password using SHA-256."""
-    return hashlib.sha256(password.encode()).hexdigest()
+    """Hash a password using Argon2id (salt and parameters are embedded in the hash)."""
+    return _ph.hash(password)
+
+def _is_legacy_hash(password_hash: str) -> bool:
+    return not password_hash.startswith("$argon2")
+
+def check_password(password_hash: str, password: str) -> bool:
+    """Verify a password against an Argon2 hash, or a legacy unsalted SHA-256 hex digest."""
+    if _is_legacy_hash(password_hash):
+        return hmac.compare_digest(password_hash, hashlib.sha256(password.encode()).hexdigest())
+    try:
+        return _ph.verify(password_hash, password)
+    except (VerificationError, InvalidHashError):  # VerifyMismatchError is a VerificationError
+        return False
 
 def add_user(username: str, password: str) -> bool:
     """Add a new user if not already exists."""
-    session = Session()
-    existing_user = session.query(User).filter_by(username=username).first()
-    if existing_user:
-        print("⚠️ Username already exists!")
+    # one statement: the uniqueness check and the insert cannot race, and there is no separate SELECT
+    stmt = insert(User).values(username=username, password_hash=hash_password(password)) \
+        .on_conflict_do_nothing(index_elements=["username"]).returning(User.id)
+    with SessionLocal() as session:
+        try:
+            row = session.execute(stmt).first()
+            session.commit()
+        except Exception:
+            session.rollback()
+            raise
+    if row is None:
+        log.debug("add_user: username exists user=%s", username)
         return False
-
-    hashed_pw = hash_password(password)
-    new_user = User(username=username, password_hash=hashed_pw)
-    session.add(new_user)
-    session.commit()
-    print(f"✅ User '{username}' added successfully!")
+    _clear_user_rows()
+    log.debug("add_user: added user=%s", username)
     return True
 
 def list_users():
-    """List all users."""
-    session = Session()
-    users = session.query(User).all()
-    for user in users:
-        print(user.id, user.username, user.password_hash)
+    """Return all users as (id, username, password_hash) tuples."""
+    with SessionLocal() as session:
+        users = [tuple(row) for row in session.execute(select(User.id, User.username, User.password_hash))]
+    log.debug("list_users: %d users", len(users))
+    return users
+
+# username -> (expires_at, (id, password_hash)); only hits are stored, and only briefly, so
+# users created, deleted or re-hashed by another process are seen within _USER_ROW_TTL seconds
+_USER_ROW_TTL = 30.0
+_USER_ROW_MAX = 1024
+_user_rows = {}
+_user_rows_lock = threading.Lock()
+
+def _clear_user_rows():
+    with _user_rows_lock:
+        _user_rows.clear()
+
+def _get_user_row(username: str):
+    """(id, password_hash) for a username, or None; recent hits skip the DB round trip on reruns."""
+    now = time.monotonic()
+    hit = _user_rows.get(username)
+    if hit is not None and hit[0] > now:
+        return hit[1]
+    with SessionLocal() as session:
+        row = session.execute(_USER_BY_NAME, {"u": username}).first()
+    with _user_rows_lock:
+        if row is None:
+            _user_rows.pop(username, None)
+            return None
+        if len(_user_rows) >= _USER_ROW_MAX:
+            for name in [n for n, (exp, _) in _user_rows.items() if exp <= now] or list(_user_rows):
+                del _user_rows[name]
+        _user_rows[username] = (now + _USER_ROW_TTL, tuple(row))
+    return tuple(row)
 
 def validate_login(username: str, password: str) -> bool:
     """Check if username exists and password is correct."""
-    session = Session()
-    user = session.query(User).filter_by(username=username).first()
-
-    if not user:
-        print("❌ Username not found!")
+    row = _get_user_row(username)
+    if row is None:
+        log.debug("Login failed: unknown user=%s", username)
         return False
 
-    hashed_pw = hash_password(password)
-    if user.password_hash == hashed_pw:
-        print("✅ Login successful!")
+    user_id, password_hash = row
+    if check_password(password_hash, password):
+        if _is_legacy_hash(password_hash) or _ph.check_needs_rehash(password_hash):
+            # upgrade SHA-256 rows (or outdated Argon2 parameters) now that we have the plaintext
+            with SessionLocal() as session:
+                session.get(User, user_id).password_hash = hash_password(password)
+                session.commit()
+            _clear_user_rows()
+        log.debug("Login ok user=%s", username)
         return True
     else:
-        print("❌ Incorrect password!")
+        log.debug("Login failed: bad password user=%s", username)
         return False
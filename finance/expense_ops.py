@@ -1,26 +1,40 @@
+import logging
 from datetime import date
-from sqlalchemy.orm import sessionmaker
-from .db import engine
+from sqlalchemy import func, select
+from .db import SessionLocal
 from .models import Expense
 
-Session = sessionmaker(bind=engine)
+log = logging.getLogger(__name__)
+
+def _month_range(year: int, month: int):
+    """[first day of month, first day of next month) for index-friendly date filters."""
+    start = date(year, month, 1)
+    end = date(year + month // 12, month % 12 + 1, 1)
+    return start, end
 
 def add_expense(user_id: int, expense_date: date, amount: float, category: str, description: str):
-    session = Session()
-    try:
-        new_expense = Expense(
-            user_id=user_id,
-            date=expense_date,
-            amount=amount,
-            category=category,
-            description=description
-        )
-        session.add(new_expense)
-        session.commit()
-        return True
-    except Exception as e:
-        print("Error adding expense:", e)
-        session.rollback()
-        return False
-    finally:
-        session.close()
+    with SessionLocal() as session:
+        try:
+            new_expense = Expense(
+                user_id=user_id,
+                date=expense_date,
+                amount=amount,
+                category=category,
+                description=description
+            )
+            session.add(new_expense)
+            session.commit()
+            return True
+        except Exception as e:
+            log.warning("Error adding expense: %s", e)
+            session.rollback()
+            return False
+
+def monthly_summary(user_id: int, year: int, month: int) -> dict:
+    """{category: total amount} for one month; SQLite does the grouping, only one row per category comes back."""
+    start, end = _month_range(year, month)
+    stmt = select(Expense.category, func.sum(Expense.amount)) \
+        .where(Expense.user_id == user_id, Expense.date >= start, Expense.date < end) \
+        .group_by(Expense.category)
+    with SessionLocal() as session:
+        return dict(session.execute(stmt).all())
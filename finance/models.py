@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Float, Date, ForeignKey
+from sqlalchemy import Column, Integer, String, Float, Date, ForeignKey, Index
 from sqlalchemy.orm import relationship
 from .db import Base
 
@@ -11,11 +11,13 @@ class User(Base):
 
 class Expense(Base):
     __tablename__ = "expenses"
+    # per-user date-range queries (monthly reports, listings) probe this index instead of scanning
+    __table_args__ = (Index("ix_expense_user_date", "user_id", "date"),)
     id = Column(Integer, primary_key=True, index=True)
-    user_id = Column(Integer, ForeignKey("users.id"))
-    date = Column(Date, nullable=False)
+    user_id = Column(Integer, ForeignKey("users.id"))  # indexed as the leading column of ix_expense_user_date
+    date = Column(Date, nullable=False, index=True)
     amount = Column(Float, nullable=False)
-    category = Column(String, nullable=False)
+    category = Column(String, nullable=False, index=True)
     description = Column(String)
 
     user = relationship("User", back_populates="expenses")
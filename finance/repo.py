@@ -0,0 +1,42 @@
+# finance/repo.py
+from datetime import date
+from typing import Optional, Protocol
+
+from sqlalchemy import select
+
+from .db import SessionLocal
+from .expense_ops import add_expense as _sql_add_expense, monthly_summary
+from .models import Expense
+
+
+class ExpenseRepo(Protocol):
+    """Storage-agnostic expense access used by the UI."""
+
+    def add_expense(self, user_id: int, expense_date: date, amount: float, category: str, description: str) -> bool: ...
+
+    def list_expenses(self, user_id: int, start: Optional[date] = None, end: Optional[date] = None) -> list: ...
+
+    def monthly_sum_by_category(self, user_id: int, year: int, month: int) -> dict: ...
+
+
+class SqlExpenseRepo:
+    """ExpenseRepo backed by the SQLAlchemy models; filtering and aggregation run inside SQLite."""
+
+    def add_expense(self, user_id: int, expense_date: date, amount: float, category: str, description: str) -> bool:
+        return _sql_add_expense(user_id, expense_date, amount, category, description)
+
+    def list_expenses(self, user_id: int, start: Optional[date] = None, end: Optional[date] = None) -> list:
+        """Expenses as plain dicts, newest first; start/end are inclusive."""
+        stmt = select(Expense.id, Expense.date, Expense.amount, Expense.category, Expense.description) \
+            .where(Expense.user_id == user_id)
+        if start is not None:
+            stmt = stmt.where(Expense.date >= start)
+        if end is not None:
+            stmt = stmt.where(Expense.date <= end)
+        stmt = stmt.order_by(Expense.date.desc())
+        with SessionLocal() as session:
+            return [dict(row._mapping) for row in session.execute(stmt)]
+
+    def monthly_sum_by_category(self, user_id: int, year: int, month: int) -> dict:
+        """{category: total amount} for one month, grouped in SQL."""
+        return monthly_summary(user_id, year, month)
@@ -2,12 +2,19 @@ import firebase_admin
 from firebase_admin import credentials, firestore
 import os
 
+_INITIALIZED = False
+
 def init_db():
-    """Initialize Firebase connection."""
+    """Initialize Firebase connection (only the first call does any work)."""
+    global _INITIALIZED
+    if _INITIALIZED:
+        return
+
     SERVICE_ACCOUNT_KEY = os.path.join(os.getcwd(), "serviceAccountKey.json")
 
     if not firebase_admin._apps:
         cred = credentials.Certificate(SERVICE_ACCOUNT_KEY)
         firebase_admin.initialize_app(cred)
 
+    _INITIALIZED = True
     print("✅ Firebase Initialized Successfully")
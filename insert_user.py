@@ -1,22 +1,26 @@
 # insert_user.py
-from finance.db import engine
+from sqlalchemy import select
+from sqlalchemy.dialects.sqlite import insert
+from finance.db import SessionLocal
 from finance.models import User
-from sqlalchemy.orm import sessionmaker
 
-# Create a session
-Session = sessionmaker(bind=engine)
-session = Session()
+# Users to seed; rerunning the script skips usernames that already exist
+rows = [
+    {"username": "testuser", "password_hash": "hashed_password_example"},
+]
 
-# Create a new user
-new_user = User(username="testuser", password_hash="hashed_password_example")
+with SessionLocal() as session:
+    # one multi-row INSERT ... ON CONFLICT(username) DO NOTHING
+    stmt = insert(User).values(rows).on_conflict_do_nothing(index_elements=["username"])
+    result = session.execute(stmt)
+    session.commit()
 
-# Add and commit to the database
-session.add(new_user)
-session.commit()
+    # rowcount counts only the rows actually inserted; conflicting usernames are skipped
+    if result.rowcount:
+        print(f"✅ Inserted {result.rowcount} user(s).")
+    else:
+        print("ℹ️ All users already exist; nothing inserted.")
 
-print("✅ User inserted successfully!")
-
-# Fetch all users
-users = session.query(User).all()
-for user in users:
-    print(user.id, user.username, user.password_hash)
+    # Fetch all users
+    for user_id, username, password_hash in session.execute(select(User.id, User.username, User.password_hash)):
+        print(user_id, username, password_hash)
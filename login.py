@@ -1,5 +1,6 @@
 # login.py
 import streamlit as st
+from finance.db import SessionLocal
 from finance.db_helpers import validate_login
 
 # Streamlit page config
@@ -8,6 +9,11 @@ st.set_page_config(page_title="Finance Tracker - Login", page_icon="💰")
 st.title("💰 Smart Personal Finance Tracker")
 st.subheader("🔐 Login to Your Account")
 
+# Already logged in: skip the form and the DB/hash work on every rerun
+if st.session_state.get("logged_in"):
+    st.success(f"Logged in as {st.session_state.get('username')}.")
+    st.stop()
+
 # Login form
 with st.form("login_form"):
     username = st.text_input("Username")
@@ -16,7 +22,7 @@ with st.form("login_form"):
 
 # When form submitted
 if submit_btn:
-    if username.strip() == "" or password.strip() == "":
+    if not (username and password) or username.isspace() or password.isspace():
         st.warning("Please enter both username and password.")
     else:
         if validate_login(username, password):
@@ -25,3 +31,6 @@ if submit_btn:
             st.session_state["username"] = username
         else:
             st.error("Invalid username or password.")
+
+# Request boundary: release this thread's session back to the pool
+SessionLocal.remove()
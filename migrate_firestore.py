@@ -0,0 +1,153 @@
+# migrate_firestore.py
+"""One-off Firestore data migrations for app.py.
+
+Run from the project root (needs firebase_key.json):
+    python migrate_firestore.py
+
+Run it before deploying the app version that looks users up only at users/{username}:
+until migrate_users has run, accounts with auto-generated ids cannot log in.
+"""
+import hashlib
+import os
+import re
+from collections import defaultdict
+
+import firebase_admin
+from firebase_admin import credentials, firestore
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+BATCH_LIMIT = 500  # Firestore max writes per batch
+WORD_RE = re.compile(r"\w+")  # same tokenizer as app.keywords_for
+
+
+def category_doc_id(user_id, name, ctype):
+    """Same ids as app.category_doc_id."""
+    return hashlib.sha256(f"{user_id}|{name}|{ctype}".encode()).hexdigest()[:20]
+
+
+def init_client():
+    """Initialize firebase-admin with the same key file app.py uses."""
+    if not firebase_admin._apps:
+        cred = credentials.Certificate(os.path.join(BASE_DIR, "firebase_key.json"))
+        firebase_admin.initialize_app(cred)
+    return firestore.client()
+
+
+def seed_rollups(db):
+    """Rebuild monthly_rollups from the expenses and incomes collections.
+
+    Docs are overwritten (not merged), so the script can be re-run safely.
+    Run it while nobody is writing, otherwise concurrent increments can be lost.
+    """
+    totals = defaultdict(lambda: {"expense_total": 0.0, "expense_count": 0,
+                                  "income_total": 0.0, "income_count": 0})
+    for col_name, kind in (("expenses", "expense"), ("incomes", "income")):
+        for doc in db.collection(col_name).stream():
+            d = doc.to_dict()
+            month = str(d.get("date", ""))[:7]
+            if not d.get("user_id") or len(month) != 7:
+                continue
+            t = totals[(d["user_id"], month)]
+            t[f"{kind}_total"] += float(d.get("amount") or 0.0)
+            t[f"{kind}_count"] += 1
+
+    col = db.collection("monthly_rollups")
+    batch = db.batch()
+    pending = 0
+    for (user_id, month), fields in totals.items():
+        batch.set(col.document(f"{user_id}_{month}"), {"user_id": user_id, "month": month, **fields})
+        pending += 1
+        if pending == BATCH_LIMIT:
+            batch.commit()
+            batch = db.batch()
+            pending = 0
+    if pending:
+        batch.commit()
+    return len(totals)
+
+
+def backfill_keywords(db):
+    """Add the `keywords` array (used by the description search) to docs written before it existed."""
+    updated = 0
+    for col_name in ("expenses", "incomes"):
+        batch = db.batch()
+        pending = 0
+        for doc in db.collection(col_name).stream():
+            d = doc.to_dict()
+            if "keywords" in d:
+                continue
+            words = list({w.lower() for w in WORD_RE.findall(d.get("description") or "")})
+            batch.update(doc.reference, {"keywords": words})
+            pending += 1
+            updated += 1
+            if pending == BATCH_LIMIT:
+                batch.commit()
+                batch = db.batch()
+                pending = 0
+        if pending:
+            batch.commit()
+    return updated
+
+
+def migrate_users(db):
+    """Move users with auto-generated ids to users/{username}, so signup's create() sees every name.
+
+    The moved doc keeps the old id in `uid`: expenses, categories and budgets stay stored under it.
+    Returns (moved, skipped); skipped usernames cannot be doc ids or already have a users/{username} doc.
+    """
+    col = db.collection("users")
+    moved, skipped = 0, []
+    for doc in col.stream():
+        d = doc.to_dict()
+        username = d.get("username") or ""
+        if doc.id == username:
+            continue
+        target = col.document(username) if username and "/" not in username and username not in (".", "..") else None
+        if target is None or target.get().exists:
+            skipped.append(username)
+            continue
+        batch = db.batch()
+        batch.create(target, {**d, "uid": doc.id})
+        batch.delete(doc.reference)
+        batch.commit()
+        moved += 1
+    return moved, skipped
+
+
+def migrate_categories(db):
+    """Move auto-id categories to their deterministic ids; duplicates of one name collapse into one doc."""
+    col = db.collection("categories")
+    batch = db.batch()
+    pending = moved = 0
+    for doc in col.stream():
+        d = doc.to_dict()
+        if not all(d.get(k) for k in ("user_id", "name", "type")):
+            continue
+        doc_id = category_doc_id(d["user_id"], d["name"], d["type"])
+        if doc.id == doc_id:
+            continue
+        batch.set(col.document(doc_id), {"user_id": d["user_id"], "name": d["name"], "type": d["type"]})
+        batch.delete(doc.reference)
+        pending += 2
+        moved += 1
+        if pending >= BATCH_LIMIT - 1:
+            batch.commit()
+            batch = db.batch()
+            pending = 0
+    if pending:
+        batch.commit()
+    return moved
+
+
+if __name__ == "__main__":
+    client = init_client()
+    n, skipped = migrate_users(client)
+    print(f"✅ Moved {n} users to users/{{username}}")
+    if skipped:
+        print(f"⚠ Not moved (invalid or already taken username): {', '.join(skipped)}")
+    n = migrate_categories(client)
+    print(f"✅ Moved {n} categories to deterministic ids")
+    n = seed_rollups(client)
+    print(f"✅ Seeded {n} monthly rollup docs")
+    n = backfill_keywords(client)
+    print(f"✅ Added keywords to {n} expense/income docs")
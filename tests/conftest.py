@@ -0,0 +1,22 @@
+# tests/conftest.py
+import pytest
+from sqlalchemy import create_engine
+
+from finance import models  # noqa: F401  (registers the tables on Base)
+from finance.db import Base, SessionLocal, engine
+from finance.db_helpers import _clear_user_rows
+
+
+@pytest.fixture
+def db_engine(tmp_path):
+    """Point SessionLocal at a fresh SQLite file for one test, then restore the app engine."""
+    test_engine = create_engine(f"sqlite:///{tmp_path / 'test.db'}")
+    Base.metadata.create_all(test_engine)
+    SessionLocal.remove()
+    SessionLocal.configure(bind=test_engine)
+    _clear_user_rows()
+    yield test_engine
+    SessionLocal.remove()
+    SessionLocal.configure(bind=engine)
+    _clear_user_rows()
+    test_engine.dispose()
@@ -0,0 +1,46 @@
+# tests/test_app.py
+# app.py is a Streamlit script; importing it outside `streamlit run` renders nothing
+# (bare mode) and, without firebase_key.json, leaves Firestore unconfigured.
+import pandas as pd
+import pytest
+
+import app
+
+
+def test_keywords_for_lowercases_and_dedupes():
+    assert sorted(app.keywords_for("Lunch with Bob, lunch!")) == ["bob", "lunch", "with"]
+    assert app.keywords_for("") == []
+    assert app.keywords_for(None) == []
+
+
+def test_push_down_single_word_needs_no_local_pass():
+    base = [("user_id", "==", "u1")]
+    qtext, filters = app._push_down_text_filter("Taxi", base)
+    assert qtext is None
+    assert filters == base + [("keywords", "array_contains", "taxi")]
+    assert base == [("user_id", "==", "u1")]  # caller's list is not mutated
+
+
+def test_push_down_several_words_filters_on_longest_and_keeps_substring_search():
+    qtext, filters = app._push_down_text_filter("cab to airport", [])
+    assert qtext == "cab to airport"
+    assert filters == [("keywords", "array_contains", "airport")]
+
+
+def test_push_down_without_words_leaves_filters_alone():
+    assert app._push_down_text_filter("  !! ", []) == ("  !! ", [])
+
+
+def _expenses(n):
+    cats = ["Food", "Rent", None, "Bills"]
+    return pd.DataFrame({"category": [cats[i % 4] for i in range(n)],
+                         "amount": [float(i % 7) + 0.5 for i in range(n)]})
+
+
+@pytest.mark.parametrize("n", [20, 400])  # groupby path and bincount path
+def test_category_totals_matches_groupby(n):
+    df = _expenses(n)
+    expected = df.groupby("category")["amount"].sum().sort_values(ascending=False)
+    got = app.category_totals(df)
+    assert list(got.index) == list(expected.index)
+    assert got.to_numpy() == pytest.approx(expected.to_numpy())
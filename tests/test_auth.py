@@ -1 +1,74 @@
-#test_auth.py
\ No newline at end of file
+# tests/test_auth.py
+import hashlib
+
+from sqlalchemy import select
+
+from finance.db import SessionLocal
+from finance.db_helpers import add_user, check_password, hash_password, validate_login
+from finance.models import User
+
+
+def test_hash_password_is_salted_argon2id():
+    first, second = hash_password("secret"), hash_password("secret")
+    assert first.startswith("$argon2id$")
+    assert first != second
+    assert check_password(first, "secret") is True
+    assert check_password(first, "wrong") is False
+
+
+def test_check_password_legacy_sha256_and_garbage():
+    legacy = hashlib.sha256(b"secret").hexdigest()
+    assert check_password(legacy, "secret") is True
+    assert check_password(legacy, "wrong") is False
+    assert check_password("$argon2id$not-a-real-hash", "secret") is False
+
+
+def test_add_user_rejects_duplicate_username(db_engine):
+    assert add_user("alice", "secret") is True
+    assert add_user("alice", "other") is False
+    with SessionLocal() as session:
+        stored = session.execute(select(User.password_hash).where(User.username == "alice")).scalars().all()
+    # one row, still holding the first password
+    assert len(stored) == 1
+    assert check_password(stored[0], "secret") is True
+    assert validate_login("alice", "other") is False
+
+
+def test_validate_login_upgrades_legacy_sha256_hash(db_engine):
+    with SessionLocal() as session:
+        session.add(User(username="bob", password_hash=hashlib.sha256(b"hunter2").hexdigest()))
+        session.commit()
+
+    assert validate_login("bob", "wrong") is False
+    assert validate_login("bob", "hunter2") is True
+    with SessionLocal() as session:
+        stored = session.execute(select(User.password_hash).where(User.username == "bob")).scalar_one()
+    assert stored.startswith("$argon2")
+    assert validate_login("bob", "hunter2") is True
+
+
+def test_unknown_username_is_not_cached(db_engine):
+    assert validate_login("carol", "pw") is False
+    # created elsewhere (e.g. insert_user.py), so this process's cache is not cleared
+    with SessionLocal() as session:
+        session.add(User(username="carol", password_hash=hashlib.sha256(b"pw").hexdigest()))
+        session.commit()
+    assert validate_login("carol", "pw") is True
+
+
+def test_password_changed_elsewhere_is_seen_after_ttl(db_engine, monkeypatch):
+    import finance.db_helpers as db_helpers
+
+    add_user("gina", "old")
+    assert validate_login("gina", "old") is True
+    # another process re-hashes the password; the cached row goes stale
+    with SessionLocal() as session:
+        session.get(User, session.execute(select(User.id).where(User.username == "gina")).scalar_one()) \
+            .password_hash = hashlib.sha256(b"new").hexdigest()
+        session.commit()
+    assert validate_login("gina", "new") is False  # still within the TTL
+
+    now = db_helpers.time.monotonic()
+    monkeypatch.setattr(db_helpers.time, "monotonic", lambda: now + db_helpers._USER_ROW_TTL + 1)
+    assert validate_login("gina", "old") is False
+    assert validate_login("gina", "new") is True
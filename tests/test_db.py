@@ -1 +1,65 @@
-#test_db.py
\ No newline at end of file
+# tests/test_db.py
+from datetime import date
+
+from finance.db import SessionLocal
+from finance.expense_ops import add_expense, monthly_summary
+from finance.models import User
+from finance.repo import SqlExpenseRepo
+
+
+def _user(username="dave"):
+    with SessionLocal() as session:
+        user = User(username=username, password_hash="x")
+        session.add(user)
+        session.commit()
+        return user.id
+
+
+def test_monthly_summary_groups_by_category(db_engine):
+    uid = _user()
+    add_expense(uid, date(2024, 3, 1), 10.0, "Food", "")
+    add_expense(uid, date(2024, 3, 15), 5.5, "Food", "")
+    add_expense(uid, date(2024, 3, 31), 20.0, "Bills", "")
+    assert monthly_summary(uid, 2024, 3) == {"Food": 15.5, "Bills": 20.0}
+
+
+def test_monthly_summary_december_january_boundary(db_engine):
+    uid = _user()
+    add_expense(uid, date(2023, 11, 30), 1.0, "Food", "")
+    add_expense(uid, date(2023, 12, 1), 2.0, "Food", "")
+    add_expense(uid, date(2023, 12, 31), 4.0, "Food", "")
+    add_expense(uid, date(2024, 1, 1), 8.0, "Food", "")
+    assert monthly_summary(uid, 2023, 12) == {"Food": 6.0}
+    assert monthly_summary(uid, 2024, 1) == {"Food": 8.0}
+
+
+def test_monthly_summary_only_counts_the_given_user(db_engine):
+    uid, other = _user("erin"), _user("frank")
+    add_expense(uid, date(2024, 5, 2), 3.0, "Transport", "")
+    add_expense(other, date(2024, 5, 2), 7.0, "Transport", "")
+    assert monthly_summary(uid, 2024, 5) == {"Transport": 3.0}
+    assert monthly_summary(uid, 2024, 6) == {}
+
+
+def test_repo_list_expenses_newest_first_with_inclusive_bounds(db_engine):
+    uid, other = _user("hana"), _user("ivan")
+    repo = SqlExpenseRepo()
+    assert repo.add_expense(uid, date(2024, 2, 1), 1.0, "Food", "a") is True
+    repo.add_expense(uid, date(2024, 2, 15), 2.0, "Food", "b")
+    repo.add_expense(uid, date(2024, 2, 29), 3.0, "Bills", "c")
+    repo.add_expense(other, date(2024, 2, 15), 9.0, "Food", "not mine")
+
+    rows = repo.list_expenses(uid)
+    assert [r["description"] for r in rows] == ["c", "b", "a"]
+    assert set(rows[0]) == {"id", "date", "amount", "category", "description"}
+
+    rows = repo.list_expenses(uid, start=date(2024, 2, 15), end=date(2024, 2, 29))
+    assert [r["amount"] for r in rows] == [3.0, 2.0]
+    assert repo.list_expenses(uid, end=date(2024, 1, 31)) == []
+
+
+def test_repo_monthly_sum_by_category_uses_monthly_summary(db_engine):
+    uid = _user("jack")
+    add_expense(uid, date(2024, 12, 31), 4.0, "Gifts", "")
+    add_expense(uid, date(2025, 1, 1), 6.0, "Gifts", "")
+    assert SqlExpenseRepo().monthly_sum_by_category(uid, 2024, 12) == monthly_summary(uid, 2024, 12) == {"Gifts": 4.0}
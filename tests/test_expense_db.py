@@ -0,0 +1,14 @@
+# tests/test_expense_db.py
+from expense_db import _month_bounds
+
+
+def test_month_bounds_mid_year():
+    assert _month_bounds("2024-03") == ("2024-03-01", "2024-04-01")
+
+
+def test_month_bounds_december_rolls_into_next_year():
+    assert _month_bounds("2023-12") == ("2023-12-01", "2024-01-01")
+
+
+def test_month_bounds_accepts_unpadded_month():
+    assert _month_bounds("2024-9") == ("2024-09-01", "2024-10-01")